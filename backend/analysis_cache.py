@@ -0,0 +1,64 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from diskcache import Cache
+from cache_dir import cache_dir
+
+class AnalysisCache:
+    def __init__(self, directory: Optional[str] = None, similarity_threshold: float = 0.95,
+                 max_queries_per_set: int = 64):
+        """Initialize on-disk memo of full persona analysis results"""
+        self.directory = directory or cache_dir("analysis_cache")
+        self.similarity_threshold = similarity_threshold
+        self.max_queries_per_set = max_queries_per_set
+        self._cache = Cache(self.directory)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the memoized result, or None on a miss"""
+        value = self._cache.get(f"result:{key}")
+        return orjson.loads(value) if value is not None else None
+
+    def set(self, key: str, result: Dict[str, Any]):
+        self._cache.set(f"result:{key}", orjson.dumps(result))
+
+    def find_similar(self, document_set_key: str, query_vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        Reuse the result of an earlier query on the same documents whose persona + job
+        embedding has cosine similarity above the threshold. The per-set index is small,
+        so a flat inner-product search is a single matrix-vector product.
+        """
+        keys, vectors = self._load_index(document_set_key)
+        if not keys:
+            return None
+
+        vectors = vectors.astype(np.float32)
+        query = query_vector.astype(np.float32)
+        similarities = (vectors @ query) / np.clip(
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(query), 1e-12, None
+        )
+
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return self.get(keys[best])
+
+    def add_query(self, document_set_key: str, query_vector: np.ndarray, key: str):
+        """Index a query embedding for similarity lookups, keeping the most recent entries per document set"""
+        with self._cache.transact():
+            keys, vectors = self._load_index(document_set_key)
+            keep = [position for position, existing in enumerate(keys) if existing != key][-(self.max_queries_per_set - 1):]
+            keys = [keys[position] for position in keep] + [key]
+            query_row = query_vector.astype(np.float16)[None, :]
+            vectors = np.vstack([vectors[keep], query_row]) if keep else query_row
+            # Keys as JSON and vectors as one raw FP16 matrix, so loading the index never unpickles
+            self._cache.set(f"index-keys:{document_set_key}", orjson.dumps(keys))
+            self._cache.set(f"index-vectors:{document_set_key}", vectors.tobytes())
+
+    def _load_index(self, document_set_key: str) -> Tuple[List[str], np.ndarray]:
+        keys = self._cache.get(f"index-keys:{document_set_key}")
+        vectors = self._cache.get(f"index-vectors:{document_set_key}")
+        if keys is None or vectors is None:
+            return [], np.empty((0, 0), dtype=np.float16)
+        keys = orjson.loads(keys)
+        return keys, np.frombuffer(vectors, dtype=np.float16).reshape(len(keys), -1)
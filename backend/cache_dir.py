@@ -0,0 +1,11 @@
+import os
+
+def cache_dir(name: str) -> str:
+    """
+    Per-user cache directory, overridable with ADOBEPS_CACHE_DIR. Created owner-only so
+    another local user can't pre-create or plant entries in it, as they could under /tmp.
+    """
+    root = os.environ.get("ADOBEPS_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "adobeps")
+    directory = os.path.join(root, name)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    return directory
@@ -0,0 +1,32 @@
+import hashlib
+from typing import Dict, List, Optional
+
+import numpy as np
+from diskcache import Cache
+from cache_dir import cache_dir
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, directory: Optional[str] = None):
+        """Initialize on-disk embedding cache shared across processes and runs"""
+        self.model_name = model_name
+        self.directory = directory or cache_dir("emb_cache")
+        self._cache = Cache(self.directory)
+
+    def key(self, text: str) -> bytes:
+        """Build cache key from model name and text so switching models never returns stale vectors"""
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return cached embeddings for the keys that are present"""
+        hits = {}
+        for key in keys:
+            value = self._cache.get(key)
+            if value is not None:
+                hits[key] = np.frombuffer(value, dtype=np.float16)
+        return hits
+
+    def set_many(self, items: Dict[bytes, np.ndarray]):
+        """Store embeddings as raw FP16 bytes: half the footprint of FP32, and nothing is ever unpickled"""
+        with self._cache.transact():
+            for key, vector in items.items():
+                self._cache.set(key, vector.astype(np.float16).tobytes())
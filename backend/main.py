@@ -1,20 +1,35 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 import uvicorn
+import aiofiles
+import asyncio
+import concurrent.futures
+import multiprocessing
 import os
-import json
+import orjson
+import shutil
+import tempfile
 import time
 from typing import List, Optional
 from pydantic import BaseModel
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
 
-from pdf_processor import PDFProcessor
-from persona_analyzer import PersonaAnalyzer
+from workers import init_worker, extract_outline_job, analyze_persona_job
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    executor.shutdown(wait=False, cancel_futures=True)
 
 app = FastAPI(
     title="Adobe PDF Research Companion API",
     description="Intelligent PDF analysis and persona-driven insights",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend integration
@@ -26,21 +41,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize processors (lazy loading to avoid memory issues)
-pdf_processor = None
-persona_analyzer = None
+# CPU-bound PDF parsing and inference run in worker processes so the event loop never blocks.
+# Each worker holds its own copy of the models, so the pool stays small and the cores are
+# split between workers instead of each using them all.
+POOL_WORKERS = min(4, os.cpu_count() or 1)
+WORKER_THREADS = max(1, (os.cpu_count() or 1) // POOL_WORKERS)
+
+def _create_executor() -> concurrent.futures.ProcessPoolExecutor:
+    # Spawn rather than fork: uvicorn has already started threads by the time the pool starts
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=POOL_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(WORKER_THREADS,)
+    )
 
-def get_pdf_processor():
-    global pdf_processor
-    if pdf_processor is None:
-        pdf_processor = PDFProcessor()
-    return pdf_processor
+executor = _create_executor()
 
-def get_persona_analyzer():
-    global persona_analyzer
-    if persona_analyzer is None:
-        persona_analyzer = PersonaAnalyzer()
-    return persona_analyzer
+async def run_in_executor(func, *args):
+    """Run a CPU-bound job in the process pool without blocking the event loop"""
+    global executor
+    pool = executor
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        # A worker died (OOM kill, native crash) and took the pool with it; replace it once and
+        # retry. Concurrent jobs see the same broken pool, so only the first one replaces it.
+        if executor is pool:
+            executor = _create_executor()
+            pool.shutdown(wait=False, cancel_futures=True)
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+def _save_upload(upload: UploadFile) -> str:
+    """Stream an upload to a temp file in 1 MiB chunks so peak memory is independent of PDF size"""
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as buffer:
+        try:
+            shutil.copyfileobj(upload.file, buffer, length=1 << 20)
+        except BaseException:
+            os.remove(buffer.name)
+            raise
+        return buffer.name
 
 class PersonaRequest(BaseModel):
     persona_description: str
@@ -65,19 +105,16 @@ async def extract_outline(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="File must be a PDF")
         
         # Save uploaded file temporarily
-        temp_path = f"/tmp/{file.filename}"
-        with open(temp_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        temp_path = await run_in_threadpool(_save_upload, file)
         
-        # Process PDF
-        start_time = time.time()
-        processor = get_pdf_processor()
-        result = processor.extract_outline(temp_path)
-        processing_time = time.time() - start_time
-        
-        # Clean up
-        os.remove(temp_path)
+        try:
+            # Process PDF
+            start_time = time.time()
+            result = await run_in_executor(extract_outline_job, temp_path)
+            processing_time = time.time() - start_time
+        finally:
+            # Clean up
+            os.remove(temp_path)
         
         return {
             "success": True,
@@ -85,6 +122,8 @@ async def extract_outline(file: UploadFile = File(...)):
             "result": result
         }
         
+    except HTTPException:
+        raise  # Validation errors keep their status instead of becoming a 500
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -105,11 +144,11 @@ async def analyze_persona(request: PersonaRequest):
         
         # Process persona analysis
         start_time = time.time()
-        analyzer = get_persona_analyzer()
-        result = analyzer.analyze(
-            pdf_files=request.pdf_files,
-            persona_description=request.persona_description,
-            job_to_be_done=request.job_to_be_done
+        result = await run_in_executor(
+            analyze_persona_job,
+            request.pdf_files,
+            request.persona_description,
+            request.job_to_be_done
         )
         processing_time = time.time() - start_time
         
@@ -119,6 +158,8 @@ async def analyze_persona(request: PersonaRequest):
             "result": result
         }
         
+    except HTTPException:
+        raise  # Validation errors keep their status instead of becoming a 500
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -128,7 +169,7 @@ async def batch_process(background_tasks: BackgroundTasks):
     Batch processing endpoint for Docker container
     Processes all PDFs in /app/input and saves results to /app/output
     """
-    def process_batch():
+    async def process_batch():
         input_dir = "/app/input"
         output_dir = "/app/output"
         
@@ -139,20 +180,21 @@ async def batch_process(background_tasks: BackgroundTasks):
         
         pdf_files = [f for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
         
-        for pdf_file in pdf_files:
-            pdf_path = os.path.join(input_dir, pdf_file)
-            try:
-                # Extract outline
-                processor = get_pdf_processor()
-                outline_result = processor.extract_outline(pdf_path)
-                
-                # Save result
-                output_file = os.path.join(output_dir, f"{pdf_file}.outline.json")
-                with open(output_file, 'w') as f:
-                    json.dump(outline_result, f, indent=2)
-                    
-            except Exception as e:
-                print(f"Error processing {pdf_file}: {str(e)}")
+        # Extract all outlines concurrently across the process pool
+        results = await asyncio.gather(
+            *[run_in_executor(extract_outline_job, os.path.join(input_dir, pdf_file)) for pdf_file in pdf_files],
+            return_exceptions=True
+        )
+        
+        for pdf_file, outline_result in zip(pdf_files, results):
+            if isinstance(outline_result, Exception):
+                print(f"Error processing {pdf_file}: {str(outline_result)}")
+                continue
+            
+            # Save result
+            output_file = os.path.join(output_dir, f"{pdf_file}.outline.json")
+            async with aiofiles.open(output_file, 'wb') as f:
+                await f.write(orjson.dumps(outline_result, option=orjson.OPT_INDENT_2))
     
     background_tasks.add_task(process_batch)
     return {"message": "Batch processing started"}
@@ -0,0 +1,104 @@
+import os
+import platform
+import shutil
+import tempfile
+from typing import List
+
+import numpy as np
+import onnxruntime as ort
+from filelock import FileLock
+from transformers import AutoTokenizer
+
+class OnnxEncoder:
+    def __init__(self, model_id: str = "sentence-transformers/all-MiniLM-L6-v2", model_dir: str = None,
+                 num_threads: int = None):
+        """Initialize INT8-quantized ONNX Runtime encoder, exporting the model on first use"""
+        self.model_id = model_id
+        self.quantization_target = self._quantization_target()
+        # One export per kernel set, so an image built on one CPU re-exports on a host that lacks it
+        self.model_dir = model_dir or os.path.join(os.path.dirname(__file__), "models", f"minilm-onnx-{self.quantization_target}")
+        self.max_seq_length = 256  # Matches SentenceTransformer's limit for MiniLM
+
+        model_path = os.path.join(self.model_dir, "model_quantized.onnx")
+        if not os.path.exists(model_path):
+            # Pool workers may all miss at once; only one exports, the rest wait and reuse it
+            with FileLock(self.model_dir + ".lock"):
+                if not os.path.exists(model_path):
+                    self._export_quantized()
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = num_threads or os.cpu_count() or 1
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=sess_options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _export_quantized(self):
+        """
+        One-time export of the HF model to ONNX followed by dynamic INT8 quantization.
+        Everything is written to a scratch directory next to model_dir and renamed into
+        place, so readers never see a half-written model.
+        """
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        parent_dir = os.path.dirname(self.model_dir)
+        os.makedirs(parent_dir, exist_ok=True)
+        export_dir = tempfile.mkdtemp(prefix=".minilm-export-", dir=parent_dir)
+        try:
+            ort_model = ORTModelForFeatureExtraction.from_pretrained(self.model_id, export=True)
+            ort_model.save_pretrained(export_dir)
+            AutoTokenizer.from_pretrained(self.model_id).save_pretrained(export_dir)
+
+            quantizer = ORTQuantizer.from_pretrained(ort_model)
+            if self.quantization_target in ("arm64", "avx512_vnni"):
+                qconfig = getattr(AutoQuantizationConfig, self.quantization_target)(is_static=False, per_channel=False)
+            else:
+                # Without VNNI, u8*s8 products can saturate in 16-bit accumulators; 7-bit weights avoid that
+                qconfig = getattr(AutoQuantizationConfig, self.quantization_target)(
+                    is_static=False, per_channel=False, reduce_range=True
+                )
+            quantizer.quantize(save_dir=export_dir, quantization_config=qconfig)
+
+            # Clear out any partial export left behind by an interrupted run
+            shutil.rmtree(self.model_dir, ignore_errors=True)
+            os.replace(export_dir, self.model_dir)
+        finally:
+            shutil.rmtree(export_dir, ignore_errors=True)
+
+    @staticmethod
+    def _quantization_target() -> str:
+        """Pick the INT8 kernel set the host CPU actually has"""
+        if platform.machine().lower() in ("arm64", "aarch64"):
+            return "arm64"
+        try:
+            with open("/proc/cpuinfo") as cpuinfo:
+                flags = set(next((line for line in cpuinfo if line.startswith("flags")), "").split())
+        except OSError:
+            flags = set()
+        if "avx512_vnni" in flags:
+            return "avx512_vnni"
+        if "avx512f" in flags:
+            return "avx512"
+        return "avx2"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts as one batch, returning mean-pooled L2-normalized embeddings"""
+        features = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        inputs = {name: value.astype(np.int64) for name, value in features.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling over non-padding tokens
+        mask = features["attention_mask"][..., np.newaxis].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        # L2 normalize
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.clip(norms, 1e-12, None)
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import orjson
+import xxhash
+from diskcache import Cache
+from cache_dir import cache_dir
+
+class OutlineCache:
+    def __init__(self, namespace: str, directory: Optional[str] = None, memory_size: int = 128):
+        """Initialize outline cache: in-process LRU in front of an on-disk store shared across processes"""
+        self.namespace = namespace
+        self.directory = directory or cache_dir("outline_cache")
+        self.memory_size = memory_size
+        self._cache = Cache(self.directory)
+        self._memory = OrderedDict()
+
+    def key(self, pdf_path: str, chunk_size: int = 1 << 20) -> str:
+        """
+        Content fingerprint: xxh64 over the whole file, streamed in 1 MiB chunks.
+        Same-size PDFs can differ only in their middle streams, so nothing is sampled;
+        xxh64 runs at several GB/s, so a 50-page PDF hashes in milliseconds.
+        """
+        digest = xxhash.xxh64()
+        with open(pdf_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+        return f"{self.namespace}:{digest.hexdigest()}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the cached outline, or None on a miss"""
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+        else:
+            value = self._cache.get(key)
+            if value is None:
+                return None
+            self._remember(key, value)
+        # Decode on every hit so callers can mutate the result without touching the cache
+        return orjson.loads(value)
+
+    def set(self, key: str, outline: Dict[str, Any]):
+        """Store outline as JSON in memory and on disk"""
+        value = orjson.dumps(outline)
+        self._cache.set(key, value)
+        self._remember(key, value)
+
+    def _remember(self, key: str, value: bytes):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
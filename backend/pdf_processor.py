@@ -1,162 +1,212 @@
-import PyPDF2
+import fitz  # PyMuPDF
 import re
 import json
-from typing import List, Dict, Any, Tuple
-from transformers import AutoTokenizer, AutoModel
-import torch
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
-from pdfminer.high_level import extract_text_to_fp
-from pdfminer.layout import LAParams
-from io import StringIO
+from outline_cache import OutlineCache
+
+# Heading patterns for detection
+_ALL_CAPS = r'[A-Z][A-Z\s]{2,}$'
+_NUMBERED = r'\d+\.\s+[A-Z]'
+_TITLE_CASE = r'[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*$'
+_ROMAN = r'[IVX]+\.\s+[A-Z]'
+
+# Compiled once at import; all heading patterns share a single alternation so each line is matched once
+HEADING_RE = re.compile(rf'^(?:{_ALL_CAPS}|{_NUMBERED}|{_TITLE_CASE}|{_ROMAN})')
+CHAPTER_RE = re.compile(rf'^(?:{_NUMBERED}|{_ROMAN})')
+TITLE_CASE_RE = re.compile(rf'^{_TITLE_CASE}')
+
+# Heading level labels, indexed by level code
+HEADING_LEVELS = np.array(["H1", "H2", "H3"])
+
+def _heading_level_codes(is_chapter: np.ndarray, is_upper: np.ndarray,
+                         is_title_case: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Vectorized heading level (0=H1, 1=H2, 2=H3) from per-heading flags"""
+    # H1: Main chapter titles, usually numbered or very prominent
+    h1 = is_chapter | (is_upper & (lengths > 5))
+    # H2: Section headings, often title case with moderate length
+    h2 = is_title_case & (lengths > 10) & (lengths < 50)
+    # H3: Subsection headings, shorter or less prominent
+    return np.select([h1, h2], [0, 1], default=2).astype(np.int8)
+
+def _is_upper_short(text: str) -> bool:
+    """Short line that is ALL CAPS or capitalized with few words"""
+    return len(text) < 100 and (text.isupper() or (text[0].isupper() and text.count(' ') <= 8))
+
+def _is_heading(text: str) -> bool:
+    """Determine if a line of text is a heading"""
+    if not text or len(text) < 3:
+        return False
+    
+    return bool(HEADING_RE.match(text)) or _is_upper_short(text)
+
+@dataclass
+class PageText:
+    """One parsed PDF page, shared by title and heading detection"""
+    index: int
+    lines: List[str]
+    font_sizes: Optional[np.ndarray]  # Largest font size per line, aligned with lines
+
+def _parse_page(pdf_doc: fitz.Document, page_idx: int) -> PageText:
+    """Extract non-empty lines and their font sizes from a single page"""
+    lines = []
+    font_sizes = []
+    for block in pdf_doc[page_idx].get_text("dict")["blocks"]:
+        if block["type"] != 0:  # Skip image blocks
+            continue
+        for line in block["lines"]:
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if not spans:
+                continue
+            lines.append("".join(span["text"] for span in line["spans"]).strip())
+            font_sizes.append(max(span["size"] for span in spans))
+    
+    return PageText(
+        index=page_idx,
+        lines=lines,
+        font_sizes=np.array(font_sizes, dtype=np.float32)
+    )
 
 class PDFProcessor:
     def __init__(self):
         """Initialize PDF processor with lightweight models"""
-        # Load lightweight model for heading detection (≤200MB)
+        # Lightweight model for heading detection, loaded on first use (extraction itself never needs it)
         self.model_name = "distilbert-base-uncased"  # ~260MB but we'll use only for inference
-        try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModel.from_pretrained(self.model_name)
-        except Exception as e:
-            print(f"Warning: Could not load ML model: {e}")
-            self.tokenizer = None
-            self.model = None
-        
-        # Heading patterns for detection
-        self.heading_patterns = [
-            r'^[A-Z][A-Z\s]{2,}$',  # ALL CAPS
-            r'^\d+\.\s+[A-Z]',      # Numbered headings
-            r'^[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*$',  # Title Case
-            r'^[IVX]+\.\s+[A-Z]',   # Roman numerals
-        ]
+        self._tokenizer = None
+        self._model = None
         
         # Font size thresholds (relative)
         self.large_font_threshold = 14
         self.medium_font_threshold = 12
+        self.heading_font_ratio = 1.2  # Heading lines are at least this much larger than body text
         
-    def extract_outline(self, pdf_path: str) -> Dict[str, Any]:
+        # Outlines keyed by file content; bump the namespace when extraction logic changes
+        self.outline_cache = OutlineCache("outline-v2")
+        
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return self._tokenizer
+    
+    @property
+    def model(self):
+        if self._model is None:
+            from transformers import AutoModel
+            self._model = AutoModel.from_pretrained(self.model_name)
+        return self._model
+    
+    def extract_outline(self, pdf_path: str, cache_key: Optional[str] = None) -> Dict[str, Any]:
         """
         Extract PDF outline with title and hierarchical structure
         Returns: { title, outline: [ { level: H1|H2|H3, text, page }... ] }
+        Pass cache_key when the caller has already fingerprinted the file
         """
         try:
-            # Extract text with layout information
-            text_content = self._extract_text_with_layout(pdf_path)
+            # Repeat PDFs (same bytes, any path) skip parsing entirely
+            cache_key = cache_key or self.outline_cache.key(pdf_path)
+            cached_outline = self.outline_cache.get(cache_key)
+            if cached_outline is not None:
+                return cached_outline
+            
+            # Single parse shared by every step below
+            pages = self._parse_pages(pdf_path)
             
             # Extract title
-            title = self._extract_title(text_content)
+            title = self._extract_title(pages[0].lines[:10] if pages else [])
             
             # Extract headings with page numbers
-            headings = self._extract_headings_with_pages(pdf_path, text_content)
+            headings = self._extract_headings_with_pages(pages)
             
             # Classify heading levels
             classified_headings = self._classify_heading_levels(headings)
             
-            return {
+            result = {
                 "title": title,
                 "outline": classified_headings
             }
+            self.outline_cache.set(cache_key, result)
+            
+            return result
             
         except Exception as e:
             raise Exception(f"Error processing PDF: {str(e)}")
     
-    def _extract_text_with_layout(self, pdf_path: str) -> str:
-        """Extract text while preserving layout information"""
-        output = StringIO()
-        with open(pdf_path, 'rb') as file:
-            extract_text_to_fp(file, output, laparams=LAParams())
-        return output.getvalue()
+    def _parse_pages(self, pdf_path: str) -> List[PageText]:
+        """
+        Parse every page once. Pages are parsed serially: at a few ms per page a 50-page
+        PDF takes ~150 ms, less than starting a process pool, and the API already runs
+        whole documents in parallel across its worker pool.
+        """
+        with fitz.open(pdf_path) as pdf_doc:
+            return [_parse_page(pdf_doc, page_idx) for page_idx in range(len(pdf_doc))]
     
-    def _extract_title(self, text_content: str) -> str:
+    def _extract_title(self, lines: List[str]) -> str:
         """Extract document title from first few lines"""
-        lines = text_content.split('\n')[:10]  # Check first 10 lines
-        
         for line in lines:
             line = line.strip()
             if line and len(line) > 3 and len(line) < 200:
                 # Simple heuristics for title detection
                 if (line.isupper() or 
                     (line[0].isupper() and line.count(' ') <= 10) or
-                    re.match(r'^[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*$', line)):
+                    TITLE_CASE_RE.match(line)):
                     return line
         
         return "Untitled Document"
     
-    def _extract_headings_with_pages(self, pdf_path: str, text_content: str) -> List[Dict[str, Any]]:
+    def _extract_headings_with_pages(self, pages: List[PageText]) -> List[Dict[str, Any]]:
         """Extract headings with their page numbers"""
-        headings = []
+        # Lines set noticeably larger than body text are heading candidates. Without font
+        # sizes, or if the document uses a single size, fall back to text patterns alone.
+        min_heading_size = None
+        sized_pages = [page.font_sizes for page in pages if page.font_sizes is not None and len(page.font_sizes)]
+        if sized_pages:
+            font_sizes = np.concatenate(sized_pages)
+            threshold = float(np.median(font_sizes)) * self.heading_font_ratio
+            if font_sizes.max() >= threshold:
+                min_heading_size = threshold
         
-        # Use PyPDF2 for page-by-page processing
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
+        headings = []
+        for page in pages:
+            if min_heading_size is not None and page.font_sizes is not None:
+                candidates = [line for line, size in zip(page.lines, page.font_sizes) if size >= min_heading_size]
+            else:
+                candidates = page.lines
             
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                page_text = page.extract_text()
-                
-                # Split page into lines
-                lines = page_text.split('\n')
-                
-                for line in lines:
-                    line = line.strip()
-                    if self._is_heading(line):
-                        headings.append({
-                            "text": line,
-                            "page": page_num + 1,
-                            "raw_text": line
-                        })
+            for text in candidates:
+                if _is_heading(text):
+                    headings.append({
+                        "text": text,
+                        "page": page.index + 1,
+                        "raw_text": text
+                    })
         
         return headings
     
-    def _is_heading(self, text: str) -> bool:
-        """Determine if a line of text is a heading"""
-        if not text or len(text) < 3:
-            return False
-        
-        # Check pattern matching
-        for pattern in self.heading_patterns:
-            if re.match(pattern, text):
-                return True
-        
-        # Check length and capitalization
-        if (len(text) < 100 and 
-            (text.isupper() or 
-             (text[0].isupper() and text.count(' ') <= 8))):
-            return True
-        
-        return False
-    
     def _classify_heading_levels(self, headings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Classify headings into H1, H2, H3 levels based on patterns and context"""
-        classified = []
+        if not headings:
+            return []
         
-        for heading in headings:
-            text = heading["text"]
-            level = self._determine_heading_level(text, len(classified))
-            
-            classified.append({
+        # One regex pass produces flags; level assignment is then a single vectorized step
+        texts = [heading["text"] for heading in headings]
+        level_codes = _heading_level_codes(
+            is_chapter=np.array([CHAPTER_RE.match(text) is not None for text in texts]),
+            is_upper=np.array([text.isupper() for text in texts]),
+            is_title_case=np.array([TITLE_CASE_RE.match(text) is not None for text in texts]),
+            lengths=np.array([len(text) for text in texts])
+        )
+        
+        return [
+            {
                 "level": level,
-                "text": text,
+                "text": heading["text"],
                 "page": heading["page"]
-            })
-        
-        return classified
-    
-    def _determine_heading_level(self, text: str, position: int) -> str:
-        """Determine heading level (H1, H2, H3) based on text characteristics"""
-        # H1: Main chapter titles, usually numbered or very prominent
-        if (re.match(r'^\d+\.\s+[A-Z]', text) or
-            re.match(r'^[IVX]+\.\s+[A-Z]', text) or
-            text.isupper() and len(text) > 5):
-            return "H1"
-        
-        # H2: Section headings, often title case with moderate length
-        if (re.match(r'^[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*$', text) and
-            len(text) > 10 and len(text) < 50):
-            return "H2"
-        
-        # H3: Subsection headings, shorter or less prominent
-        return "H3"
+            }
+            for heading, level in zip(headings, HEADING_LEVELS[level_codes].tolist())
+        ]
     
     def get_model_size(self) -> float:
         """Get approximate model size in MB"""
@@ -1,18 +1,97 @@
+import hashlib
 import json
 import time
+from functools import cached_property
 from typing import List, Dict, Any, Tuple
 from sentence_transformers import SentenceTransformer
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+import torch
 from pdf_processor import PDFProcessor
+from embedding_cache import EmbeddingCache
+from analysis_cache import AnalysisCache
 
 class PersonaAnalyzer:
     def __init__(self):
         """Initialize persona analyzer with sentence transformer model"""
-        # Load sentence transformer model (≤1GB constraint)
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')  # ~90MB model
+        # Sentence transformer model (≤1GB constraint), loaded on first use
+        self._model = None
+        self._eager_auto_model = None  # Set once torch.compile has replaced the transformer
+        self.embedding_dim = 384
         self.pdf_processor = PDFProcessor()
+        self.analysis_cache = AnalysisCache()
         
+        # Memoized analyses are keyed by this and the encoder backend; bump it when ranking or output changes
+        self.analysis_version = "analysis-v1"
+        
+        # Dynamic batching: ~2048 padded tokens per batch, never fewer than 8 texts
+        self.batch_token_budget = 2048
+        self.min_batch_size = 8
+        
+    @property
+    def model(self) -> SentenceTransformer:
+        if self._model is None:
+            self._model = SentenceTransformer('all-MiniLM-L6-v2')  # ~90MB model
+            # FP16 weights only on GPU; PyTorch CPU kernels for half precision are slow or missing
+            if self._model.device.type == "cuda":
+                try:
+                    self._model.half()
+                except Exception as e:
+                    print(f"Warning: Could not convert model to FP16: {e}")
+        return self._model
+    
+    @cached_property
+    def onnx_encoder(self):
+        """INT8 ONNX Runtime encoder for the hot path, or None to fall back to PyTorch"""
+        try:
+            # Imported here so a missing or broken onnxruntime only disables this path
+            from onnx_encoder import OnnxEncoder
+            # Match torch's thread count so pool workers share the cores rather than each taking all of them
+            return OnnxEncoder(num_threads=torch.get_num_threads())
+        except Exception as e:
+            print(f"Warning: Could not load ONNX encoder, using PyTorch: {e}")
+            return None
+    
+    @cached_property
+    def compiled_model(self) -> SentenceTransformer:
+        """PyTorch fallback model with its transformer compiled by torch.compile where available"""
+        model = self.model.eval()
+        if not hasattr(torch, "compile"):
+            return model
+        
+        transformer = model[0]
+        eager_model = transformer.auto_model
+        try:
+            mode = "reduce-overhead" if model.device.type == "cuda" else None
+            transformer.auto_model = torch.compile(eager_model, mode=mode)
+            self._eager_auto_model = eager_model
+            # Warm up at typical bucket sizes so compilation happens here, not mid-request
+            for batch_size in (self.min_batch_size, 64):
+                self._torch_encode(model, ["warm up"] * batch_size)
+        except Exception as e:
+            print(f"Warning: torch.compile failed, using eager model: {e}")
+            transformer.auto_model = eager_model
+            self._eager_auto_model = None
+        return model
+    
+    @cached_property
+    def use_bf16(self) -> bool:
+        """BF16 autocast only where the CPU executes it natively (e.g. Sapphire Rapids, Zen 4)"""
+        if self.onnx_encoder is not None:
+            return False
+        return self.model.device.type == "cpu" and self._cpu_supports_bf16()
+    
+    @cached_property
+    def backend_name(self) -> str:
+        """Encoder backend in use; quantized and reduced-precision vectors differ slightly"""
+        if self.onnx_encoder is not None:
+            return f"onnx-int8-{self.onnx_encoder.quantization_target}"
+        return "torch-bf16" if self.use_bf16 else "torch"
+    
+    @cached_property
+    def cache(self) -> EmbeddingCache:
+        """Embedding cache with separate keys per encoder backend"""
+        return EmbeddingCache(f"all-MiniLM-L6-v2-{self.backend_name}")
+    
     def analyze(self, pdf_files: List[str], persona_description: str, job_to_be_done: str) -> Dict[str, Any]:
         """
         Round 1B: Persona-driven analysis
@@ -21,11 +100,44 @@ class PersonaAnalyzer:
         """
         start_time = time.time()
         
+        # Fingerprint each file once; the memo keys and the outline cache lookups both use it
+        try:
+            outline_keys = {pdf_file: self.pdf_processor.outline_cache.key(pdf_file) for pdf_file in pdf_files}
+        except OSError:
+            outline_keys = {}  # Let extraction report the unreadable file; failures are never memoized
+        
+        # Reuse a memoized result for the same documents and persona/job, or failing
+        # that, for an earlier query on the same documents with a near-identical persona
+        persona_embedding = None
+        memo_keys = None
+        if outline_keys:
+            memo_keys = self._memo_keys(pdf_files, outline_keys, persona_description, job_to_be_done)
+            document_set_key, query_key = memo_keys
+            cached_result = self.analysis_cache.get(query_key)
+            if cached_result is None:
+                persona_embedding = self._create_persona_embedding(persona_description, job_to_be_done)
+                cached_result = self.analysis_cache.find_similar(document_set_key, persona_embedding)
+                if cached_result is not None:
+                    # Sections were ranked for a different wording; record which one
+                    cached_result["metadata"]["memoized_from"] = {
+                        "persona_description": cached_result["metadata"]["persona_description"],
+                        "job_to_be_done": cached_result["metadata"]["job_to_be_done"]
+                    }
+            if cached_result is not None:
+                cached_result["metadata"].update({
+                    "documents": pdf_files,
+                    "persona_description": persona_description,
+                    "job_to_be_done": job_to_be_done,
+                    "timestamp": time.time(),
+                    "processing_time": time.time() - start_time
+                })
+                return cached_result
+        
         # Extract outlines from all PDFs
         document_outlines = []
         for pdf_file in pdf_files:
             try:
-                outline = self.pdf_processor.extract_outline(pdf_file)
+                outline = self.pdf_processor.extract_outline(pdf_file, cache_key=outline_keys.get(pdf_file))
                 document_outlines.append({
                     "document": pdf_file,
                     "outline": outline
@@ -35,7 +147,8 @@ class PersonaAnalyzer:
                 continue
         
         # Create persona embedding
-        persona_embedding = self._create_persona_embedding(persona_description, job_to_be_done)
+        if persona_embedding is None:
+            persona_embedding = self._create_persona_embedding(persona_description, job_to_be_done)
         
         # Extract and rank sections
         extracted_sections = self._extract_and_rank_sections(document_outlines, persona_embedding)
@@ -56,64 +169,179 @@ class PersonaAnalyzer:
             "sub_section_analyses": sub_section_analyses
         }
         
+        if memo_keys is not None:
+            self.analysis_cache.set(query_key, result)
+            self.analysis_cache.add_query(document_set_key, persona_embedding, query_key)
+        
         return result
     
+    def _memo_keys(self, pdf_files: List[str], outline_keys: Dict[str, str], persona_description: str,
+                   job_to_be_done: str) -> Tuple[str, str]:
+        """
+        Build (document set key, query key) from the analysis version, encoder backend and
+        each file's path and content fingerprint
+        """
+        file_keys = sorted(f"{pdf_file}\0{outline_keys[pdf_file]}" for pdf_file in pdf_files)
+        
+        document_set_key = hashlib.sha1(
+            "||".join([self.analysis_version, self.backend_name, *file_keys]).encode("utf-8")
+        ).hexdigest()
+        query_key = hashlib.sha1(
+            "||".join([document_set_key, persona_description, job_to_be_done]).encode("utf-8")
+        ).hexdigest()
+        return document_set_key, query_key
+    
     def _create_persona_embedding(self, persona_description: str, job_to_be_done: str) -> np.ndarray:
-        """Create embedding for persona and job-to-be-done"""
+        """Create unit-length embedding for persona and job-to-be-done"""
         combined_text = f"{persona_description} {job_to_be_done}"
-        return self.model.encode([combined_text])[0]
+        return self._cached_encode([combined_text])[0]
+    
+    def _cached_encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts as FP16 embeddings, reusing cached ones and only running the model on misses"""
+        if not texts:
+            return np.empty((0, self.embedding_dim), dtype=np.float16)
+        
+        keys = [self.cache.key(text) for text in texts]
+        embeddings = self.cache.get_many(keys)
+        
+        # Encode each missing text once, even if it repeats across documents
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in embeddings:
+                misses.setdefault(key, text)
+        
+        if misses:
+            miss_vectors = self._encode_bucketed(list(misses.values()))
+            computed = dict(zip(misses.keys(), miss_vectors.astype(np.float16)))
+            self.cache.set_many(computed)
+            embeddings.update(computed)
+        
+        return np.stack([embeddings[key] for key in keys])
+    
+    def _encode_bucketed(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts in length-bucketed batches, returning L2-normalized embeddings in input order.
+        Texts are sorted by token count and grouped so each batch pads to similar lengths,
+        with batch size shrinking as sequences get longer.
+        """
+        if not texts:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+        
+        tokenizer = self.onnx_encoder.tokenizer if self.onnx_encoder is not None else self.model.tokenizer
+        lengths = tokenizer(texts, add_special_tokens=False, return_length=True)["length"]
+        order = np.argsort(lengths, kind="stable")
+        
+        # Group sorted texts into buckets that fit the token budget
+        buckets = []
+        bucket = []
+        for i in order:
+            # Lengths are ascending, so the incoming text sets the bucket's padded length
+            batch_size = max(self.min_batch_size, self.batch_token_budget // max(lengths[i], 1))
+            if bucket and len(bucket) >= batch_size:
+                buckets.append(bucket)
+                bucket = []
+            bucket.append(i)
+        buckets.append(bucket)
+        
+        embeddings = np.concatenate([self._encode([texts[i] for i in bucket]) for bucket in buckets])
+        
+        # Undo the length sort
+        result = np.empty_like(embeddings)
+        result[order] = embeddings
+        return result
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode one batch of texts into L2-normalized embeddings"""
+        if self.onnx_encoder is not None:
+            return self.onnx_encoder.encode(texts)
+        
+        model = self.compiled_model
+        try:
+            return self._torch_encode(model, texts)
+        except Exception as e:
+            if self._eager_auto_model is None:
+                raise
+            # Unseen shapes can recompile mid-request; fall back to eager for good rather than fail it
+            print(f"Warning: compiled model failed, using eager model: {e}")
+            model[0].auto_model = self._eager_auto_model
+            self._eager_auto_model = None
+            return self._torch_encode(model, texts)
+    
+    def _torch_encode(self, model: SentenceTransformer, texts: List[str]) -> np.ndarray:
+        """Encode one batch with the PyTorch model under inference mode (and BF16 autocast if enabled)"""
+        with torch.inference_mode(), torch.cpu.amp.autocast(enabled=self.use_bf16, dtype=torch.bfloat16):
+            embeddings = model.encode(
+                texts,
+                batch_size=len(texts),
+                convert_to_tensor=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+        # BF16 tensors have no NumPy equivalent, so upcast before converting
+        return embeddings.float().cpu().numpy()
+    
+    @staticmethod
+    def _cpu_supports_bf16() -> bool:
+        """Check whether oneDNN reports native BF16 support on this CPU"""
+        try:
+            return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+        except Exception:
+            return False
     
     def _extract_and_rank_sections(self, document_outlines: List[Dict], persona_embedding: np.ndarray) -> List[Dict]:
         """Extract sections from documents and rank by relevance to persona"""
-        all_sections = []
-        
+        # Columnar layout while computing; per-section dicts are only built for the final output
+        documents, titles, pages, levels = [], [], [], []
         for doc_outline in document_outlines:
-            document = doc_outline["document"]
-            outline = doc_outline["outline"]["outline"]
-            
-            for heading in outline:
-                # Create section text (heading + context)
-                section_text = heading["text"]
-                
-                # Create embedding for section
-                section_embedding = self.model.encode([section_text])[0]
-                
-                # Calculate similarity to persona
-                similarity = cosine_similarity([section_embedding], [persona_embedding])[0][0]
-                
-                # Determine importance rank based on similarity and heading level
-                importance_rank = self._calculate_importance_rank(similarity, heading["level"])
-                
-                all_sections.append({
-                    "document": document,
-                    "page": heading["page"],
-                    "section_title": heading["text"],
-                    "importance_rank": importance_rank,
-                    "similarity_score": float(similarity),
-                    "level": heading["level"]
-                })
+            for heading in doc_outline["outline"]["outline"]:
+                documents.append(doc_outline["document"])
+                titles.append(heading["text"])
+                pages.append(heading["page"])
+                levels.append(heading["level"])
+        pages = np.array(pages, dtype=np.int32)
+        levels = np.array(levels, dtype='<U2')
         
-        # Sort by importance rank (descending)
-        all_sections.sort(key=lambda x: x["importance_rank"], reverse=True)
+        # Embeddings are kept in FP16 and upcast only for the final product. FP16 vectors drift
+        # slightly off unit length, so a single matrix-vector product is divided by the row
+        # norms to yield the cosine similarity of every section.
+        section_embeddings = self._cached_encode(titles).astype(np.float32)
+        persona_vector = persona_embedding.astype(np.float32)
+        persona_unit = persona_vector / max(float(np.linalg.norm(persona_vector)), 1e-12)
+        row_norms = np.clip(np.linalg.norm(section_embeddings, axis=1), 1e-12, None)
+        similarities = (section_embeddings @ persona_unit) / row_norms
         
-        return all_sections
-    
-    def _calculate_importance_rank(self, similarity_score: float, heading_level: str) -> float:
-        """Calculate importance rank based on similarity and heading level"""
-        # Base rank from similarity (0-1)
-        base_rank = similarity_score
+        # Determine importance ranks based on similarity and heading level
+        importance_ranks = self._calculate_importance_ranks(similarities, levels)
+        
+        # Sort by importance rank (descending); stable so ties keep document order
+        order = np.argsort(-importance_ranks, kind="stable")
         
+        return [
+            {
+                "document": documents[i],
+                "page": int(pages[i]),
+                "section_title": titles[i],
+                "importance_rank": float(importance_ranks[i]),
+                "similarity_score": float(similarities[i]),
+                "level": str(levels[i])
+            }
+            for i in order.tolist()
+        ]
+    
+    def _calculate_importance_ranks(self, similarity_scores: np.ndarray, heading_levels: np.ndarray) -> np.ndarray:
+        """Calculate importance ranks for all sections at once from similarity and heading level"""
         # Adjust based on heading level
         level_multiplier = {
             "H1": 1.2,  # Main headings get boost
             "H2": 1.0,  # Standard weight
             "H3": 0.8   # Sub-headings get slight penalty
         }
+        multipliers = np.ones(len(heading_levels), dtype=np.float32)
+        for level, multiplier in level_multiplier.items():
+            multipliers[heading_levels == level] = multiplier
         
-        adjusted_rank = base_rank * level_multiplier.get(heading_level, 1.0)
-        
-        # Normalize to 0-1 range
-        return min(max(adjusted_rank, 0.0), 1.0)
+        # Base rank from similarity (0-1), normalized to 0-1 after adjustment
+        return np.clip(similarity_scores * multipliers, 0.0, 1.0)
     
     def _generate_sub_section_analyses(self, extracted_sections: List[Dict], persona_description: str) -> List[Dict]:
         """Generate detailed analyses for top-ranked sections"""
@@ -0,0 +1,46 @@
+"""
+Jobs run in the API's process pool. Kept apart from main.py so spawned workers import
+only the models, not the FastAPI app and its pool.
+"""
+from typing import List
+import torch
+
+try:
+    torch.set_num_interop_threads(2)
+except RuntimeError:
+    pass  # Already fixed once inter-op work has started
+torch.backends.mkldnn.enabled = True
+torch.jit.enable_onednn_fusion(True)
+
+from pdf_processor import PDFProcessor
+from persona_analyzer import PersonaAnalyzer
+
+# Each worker lazily builds its own processors (one copy of the models per worker)
+pdf_processor = None
+persona_analyzer = None
+
+def get_pdf_processor():
+    global pdf_processor
+    if pdf_processor is None:
+        pdf_processor = PDFProcessor()
+    return pdf_processor
+
+def get_persona_analyzer():
+    global persona_analyzer
+    if persona_analyzer is None:
+        persona_analyzer = PersonaAnalyzer()
+    return persona_analyzer
+
+def init_worker(num_threads: int):
+    """Give each pool worker its share of the cores; the ONNX encoder follows torch's setting"""
+    torch.set_num_threads(num_threads)
+
+def extract_outline_job(pdf_path: str):
+    return get_pdf_processor().extract_outline(pdf_path)
+
+def analyze_persona_job(pdf_files: List[str], persona_description: str, job_to_be_done: str):
+    return get_persona_analyzer().analyze(
+        pdf_files=pdf_files,
+        persona_description=persona_description,
+        job_to_be_done=job_to_be_done
+    )
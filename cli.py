@@ -7,8 +7,8 @@ Command-line interface for batch PDF processing and analysis
 import argparse
 import os
 import sys
-import json
 import time
+import orjson
 from pathlib import Path
 from typing import List, Dict, Any
 
@@ -36,8 +36,8 @@ class PDFResearchCLI:
             result['input_file'] = pdf_path
             
             if output_path:
-                with open(output_path, 'w') as f:
-                    json.dump(result, f, indent=2)
+                with open(output_path, 'wb') as f:
+                    f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
                 print(f"Results saved to: {output_path}")
             
             print(f"✓ Outline extracted in {processing_time:.2f}s")
@@ -90,8 +90,8 @@ class PDFResearchCLI:
             result['processing_time'] = processing_time
             
             if output_path:
-                with open(output_path, 'w') as f:
-                    json.dump(result, f, indent=2)
+                with open(output_path, 'wb') as f:
+                    f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
                 print(f"Results saved to: {output_path}")
             
             print(f"✓ Analysis completed in {processing_time:.2f}s")
@@ -0,0 +1,26 @@
+"""
+Shared pytest fixtures for the Adobe PDF Research Companion tests
+"""
+
+import functools
+import importlib
+
+import pytest
+
+def _memoize_model_size(module_name: str, class_name: str):
+    """Wrap a class's get_model_size in lru_cache, yielding once and restoring the original after"""
+    cls = getattr(importlib.import_module(module_name), class_name)
+    original = cls.get_model_size
+    cls.get_model_size = functools.lru_cache(maxsize=1)(original)
+    yield
+    cls.get_model_size = original
+
+# One fixture per class, so a test only imports the model stack it actually uses; the
+# parameter walk is deterministic per instance, so caching it for the session is safe
+@pytest.fixture(scope="session")
+def _cache_processor_model_size():
+    yield from _memoize_model_size("pdf_processor", "PDFProcessor")
+
+@pytest.fixture(scope="session")
+def _cache_analyzer_model_size():
+    yield from _memoize_model_size("persona_analyzer", "PersonaAnalyzer")
@@ -2,217 +2,355 @@
 """
 Test script for Adobe PDF Research Companion
 Tests the core functionality and API endpoints
+
+Run with: pytest test_app.py -n auto
+Without pytest-xdist: python test_app.py
 """
 
+import asyncio
+import contextlib
+import functools
+import importlib
+import io
 import os
+import socket
 import sys
-import json
-import time
-import requests
+import tempfile
+import numpy as np
+import orjson
+import pytest
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from unittest import mock
 
-# Add backend to path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+# Resolve repo paths once so the tests do not depend on the working directory
+_HERE = Path(__file__).resolve().parent
+_BACKEND = _HERE / "backend"
+_FRONTEND = _HERE / "frontend"
+_PACKAGE_JSON = _FRONTEND / "package.json"
 
-def test_backend_health():
-    """Test backend health endpoint"""
-    print("Testing backend health...")
-    try:
-        response = requests.get("http://localhost:8000/health")
-        if response.status_code == 200:
-            print("✓ Backend is healthy")
-            return True
-        else:
-            print(f"✗ Backend health check failed: {response.status_code}")
-            return False
-    except requests.exceptions.ConnectionError:
-        print("✗ Backend is not running")
-        return False
+# FastAPI rejects requests without the required files or form fields
+_EXPECTED_MISSING_FILE = frozenset({400, 422})
 
-def test_pdf_processor():
-    """Test PDF processor functionality"""
-    print("\nTesting PDF processor...")
+# Serialized once at import; the endpoint probe only needs the bytes. Two files is below the
+# endpoint's 3-file minimum, so it answers 400 at once instead of starting an analysis.
+_PERSONA_PAYLOAD = orjson.dumps({
+    "persona_description": "Data Scientist",
+    "job_to_be_done": "Implement ML pipeline",
+    "pdf_files": ["doc1.pdf", "doc2.pdf"]
+})
+
+@functools.lru_cache(maxsize=1)
+def _client():
+    """One keep-alive client shared by the synchronous HTTP probes, built on first use"""
+    httpx = importlib.import_module("httpx")
+    return httpx.Client(
+        base_url="http://localhost:8000",
+        timeout=httpx.Timeout(2.0, connect=0.5),
+        limits=httpx.Limits(max_connections=4, max_keepalive_connections=4)
+    )
+
+class _Log:
+    """Collect a test's report lines and write them to stdout in one call"""
+    def __init__(self, title: str):
+        self.lines = [title]
+    
+    def __call__(self, line: str):
+        self.lines.append(line)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        # Flush even when the test fails or skips so the report is never lost
+        sys.stdout.write("\n".join(self.lines) + "\n")
+
+@functools.lru_cache(maxsize=1)
+def _backend_up():
+    """One-shot TCP probe so network tests skip fast when the backend is down"""
     try:
-        from pdf_processor import PDFProcessor
-        
-        processor = PDFProcessor()
-        print(f"✓ PDF processor initialized")
-        print(f"  Model: {processor.model_name}")
-        print(f"  Size: {processor.get_model_size():.1f} MB")
-        
+        socket.create_connection(("localhost", 8000), timeout=0.2).close()
         return True
-    except Exception as e:
-        print(f"✗ PDF processor test failed: {str(e)}")
+    except OSError:
         return False
 
-def test_persona_analyzer():
-    """Test persona analyzer functionality"""
-    print("\nTesting persona analyzer...")
+@pytest.fixture(scope="session")
+def backend_up():
+    return _backend_up()
+
+@contextlib.contextmanager
+def _backend_required(message: str):
+    """Turn a refused or timed-out connection into one test failure"""
+    httpx = importlib.import_module("httpx")
     try:
-        from persona_analyzer import PersonaAnalyzer
-        
-        analyzer = PersonaAnalyzer()
-        print(f"✓ Persona analyzer initialized")
-        print(f"  Model: all-MiniLM-L6-v2")
-        print(f"  Size: {analyzer.get_model_size():.1f} MB")
+        yield
+    except (httpx.ConnectError, httpx.TimeoutException):
+        pytest.fail(message)
+
+def test_backend_health(backend_up):
+    """Test backend health endpoint"""
+    with _Log("Testing backend health...") as log:
+        if not backend_up:
+            pytest.skip("backend down")
+        with _backend_required("✗ Backend is not running"):
+            response = _client().get("/health")
         
-        return True
-    except Exception as e:
-        print(f"✗ Persona analyzer test failed: {str(e)}")
-        return False
+        assert response.status_code == 200, f"✗ Backend health check failed: {response.status_code}"
+        log("✓ Backend is healthy")
+
+@functools.lru_cache(maxsize=1)
+def _get_processor():
+    """Build the PDF processor once per interpreter"""
+    return importlib.import_module("pdf_processor").PDFProcessor()
+
+@functools.lru_cache(maxsize=1)
+def _get_analyzer():
+    """Build the persona analyzer once per interpreter"""
+    return importlib.import_module("persona_analyzer").PersonaAnalyzer()
+
+@functools.lru_cache(maxsize=1)
+def _get_cli():
+    """Build the CLI and its models once per interpreter"""
+    return importlib.import_module("cli").PDFResearchCLI()
+
+@pytest.fixture(scope="session")
+def processor(_cache_processor_model_size):
+    return _get_processor()
+
+@pytest.fixture(scope="session")
+def analyzer(_cache_analyzer_model_size):
+    return _get_analyzer()
+
+@pytest.fixture(scope="session")
+def cli(_cache_processor_model_size, _cache_analyzer_model_size):
+    return _get_cli()
+
+def test_pdf_processor(processor):
+    """Test PDF processor functionality"""
+    with _Log("\nTesting PDF processor...") as log:
+        log(f"✓ PDF processor initialized")
+        log(f"  Model: {processor.model_name}")
+        log(f"  Size: {processor.get_model_size():.1f} MB")
+
+def test_persona_analyzer(analyzer):
+    """Test persona analyzer functionality"""
+    with _Log("\nTesting persona analyzer...") as log:
+        log(f"✓ Persona analyzer initialized")
+        log(f"  Model: all-MiniLM-L6-v2")
+        log(f"  Size: {analyzer.get_model_size():.1f} MB")
 
-def test_cli():
+def test_cli(cli):
     """Test CLI functionality"""
-    print("\nTesting CLI...")
-    try:
-        from cli import PDFResearchCLI
+    with _Log("\nTesting CLI...") as log:
+        # show_model_info prints directly, so capture it into this test's report
+        with contextlib.redirect_stdout(io.StringIO()) as buffer:
+            cli.show_model_info()
+        model_info = buffer.getvalue()
+        assert model_info.startswith("Model Information:"), "✗ CLI model info was not printed"
         
-        cli = PDFResearchCLI()
-        cli.show_model_info()
-        print("✓ CLI initialized successfully")
+        log(model_info.rstrip("\n"))
+        log("✓ CLI initialized successfully")
+
+def _letter_histogram(texts):
+    """Stub encoder: unit-length letter counts, so rewordings that keep the letters embed identically"""
+    vectors = np.zeros((len(texts), 26), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for char in text.lower():
+            if "a" <= char <= "z":
+                vectors[row, ord(char) - ord("a")] += 1
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+def _stub_analyzer(cache_dir):
+    """Persona analyzer with caches under cache_dir, the stub encoder and a call-counting outline extractor"""
+    with mock.patch.dict(os.environ, {"ADOBEPS_CACHE_DIR": str(cache_dir)}):
+        analyzer = importlib.import_module("persona_analyzer").PersonaAnalyzer()
+        analyzer.backend_name = "stub"
+        analyzer.cache  # Build the embedding cache while the override is active
+    analyzer._encode_bucketed = _letter_histogram
+    
+    outline_calls = []
+    def extract_outline(pdf_path, cache_key=None):
+        outline_calls.append(pdf_path)
+        name = Path(pdf_path).read_bytes().decode()  # Raises for unreadable files, like the real parser
+        return {
+            "title": name,
+            "outline": [
+                {"level": "H1", "text": f"Introduction to {name}", "page": 1},
+                {"level": "H2", "text": "Pipeline design", "page": 2}
+            ]
+        }
+    analyzer.pdf_processor.extract_outline = extract_outline
+    return analyzer, outline_calls
+
+def _temp_dir():
+    return Path(tempfile.mkdtemp(prefix="adobeps-test-"))
+
+def test_analysis_memo(tmp_path):
+    """Test memoized persona analysis without loading any models"""
+    with _Log("\nTesting analysis memo...") as log:
+        analyzer, outline_calls = _stub_analyzer(tmp_path / "cache")
+        pdf_files = []
+        for name in ("alpha", "beta", "gamma"):
+            path = tmp_path / f"{name}.pdf"
+            path.write_bytes(name.encode())
+            pdf_files.append(str(path))
         
-        return True
-    except Exception as e:
-        print(f"✗ CLI test failed: {str(e)}")
-        return False
+        first = analyzer.analyze(pdf_files, "Data Scientist", "Implement ML pipeline")
+        assert len(outline_calls) == 3
+        
+        exact = analyzer.analyze(pdf_files, "Data Scientist", "Implement ML pipeline")
+        assert len(outline_calls) == 3, "✗ Exact repeat was recomputed"
+        assert exact["extracted_sections"] == first["extracted_sections"]
+        assert "memoized_from" not in exact["metadata"]
+        log("✓ Exact repeat served from the memo")
+        
+        similar = analyzer.analyze(pdf_files, "data scientist", "Implement ML pipeline!")
+        assert len(outline_calls) == 3, "✗ Near-identical persona was recomputed"
+        assert similar["metadata"]["persona_description"] == "data scientist"
+        assert similar["metadata"]["memoized_from"] == {
+            "persona_description": "Data Scientist",
+            "job_to_be_done": "Implement ML pipeline"
+        }, "✗ Similarity hit does not record the original query"
+        log("✓ Near-identical persona served from the memo and marked memoized_from")
+        
+        with_missing = pdf_files[:2] + [str(tmp_path / "missing.pdf")]
+        for _ in range(2):
+            analyzer.analyze(with_missing, "Data Scientist", "Implement ML pipeline")
+        assert len(outline_calls) == 9, "✗ Analysis with an unreadable file was memoized"
+        log("✓ Analyses with unreadable files are never memoized")
+        
+        analyzer.backend_name = "stub-2"
+        analyzer.analyze(pdf_files, "Data Scientist", "Implement ML pipeline")
+        assert len(outline_calls) == 12, "✗ Memo survived an encoder backend change"
+        analyzer.analysis_version = "analysis-test"
+        analyzer.analyze(pdf_files, "Data Scientist", "Implement ML pipeline")
+        assert len(outline_calls) == 15, "✗ Memo survived an analysis version bump"
+        log("✓ Backend and version changes invalidate the memo")
 
-def test_api_endpoints():
-    """Test API endpoints"""
-    print("\nTesting API endpoints...")
+async def _probe_api_endpoints():
+    """Post to both API endpoints concurrently over one client"""
+    httpx = importlib.import_module("httpx")
     
-    # Test outline extraction endpoint
-    try:
-        # Create a mock PDF file for testing
-        test_pdf_path = "test_document.pdf"
+    async with httpx.AsyncClient(base_url="http://localhost:8000", timeout=httpx.Timeout(2.0, connect=0.5)) as client:
+        # We only check that the endpoints exist, so no real PDF files are sent
+        return await asyncio.gather(
+            client.post("/extract-outline"),
+            client.post("/analyze-persona", content=_PERSONA_PAYLOAD, headers={"Content-Type": "application/json"})
+        )
+
+def test_api_endpoints(backend_up):
+    """Test API endpoints"""
+    with _Log("\nTesting API endpoints...") as log:
+        if not backend_up:
+            pytest.skip("backend down")
+        
+        # gather raises on the first refused connection, so the sad path waits for one timeout
+        with _backend_required("✗ API endpoints not accessible (backend not running)"):
+            outline_response, persona_response = asyncio.run(_probe_api_endpoints())
         
-        # This would normally be a real PDF file
-        # For testing, we'll just check if the endpoint exists
-        response = requests.post("http://localhost:8000/extract-outline")
-        if response.status_code in [400, 422]:  # Expected for missing file
-            print("✓ Outline extraction endpoint is accessible")
+        # Test outline extraction endpoint
+        if outline_response.status_code in _EXPECTED_MISSING_FILE:  # Expected for missing file
+            log("✓ Outline extraction endpoint is accessible")
         else:
-            print(f"⚠ Unexpected response: {response.status_code}")
-            
-    except requests.exceptions.ConnectionError:
-        print("✗ API endpoints not accessible (backend not running)")
-        return False
-    
-    # Test persona analysis endpoint
-    try:
-        test_data = {
-            "persona_description": "Data Scientist",
-            "job_to_be_done": "Implement ML pipeline",
-            "pdf_files": ["doc1.pdf", "doc2.pdf", "doc3.pdf"]
-        }
+            log(f"⚠ Unexpected response: {outline_response.status_code}")
         
-        response = requests.post("http://localhost:8000/analyze-persona", json=test_data)
-        if response.status_code in [400, 422]:  # Expected for missing files
-            print("✓ Persona analysis endpoint is accessible")
+        # Test persona analysis endpoint
+        if persona_response.status_code in _EXPECTED_MISSING_FILE:  # Expected for missing files
+            log("✓ Persona analysis endpoint is accessible")
         else:
-            print(f"⚠ Unexpected response: {response.status_code}")
-            
-    except requests.exceptions.ConnectionError:
-        print("✗ API endpoints not accessible")
-        return False
-    
-    return True
+            log(f"⚠ Unexpected response: {persona_response.status_code}")
+
+@functools.lru_cache(maxsize=None)
+def _dir_names(path):
+    """List a directory once with a single scandir pass"""
+    with os.scandir(path) as entries:
+        return frozenset(entry.name for entry in entries)
 
 def test_frontend_build():
     """Test if frontend can be built"""
-    print("\nTesting frontend build...")
-    
-    frontend_dir = Path("frontend")
-    if not frontend_dir.exists():
-        print("✗ Frontend directory not found")
-        return False
-    
-    package_json = frontend_dir / "package.json"
-    if not package_json.exists():
-        print("✗ package.json not found")
-        return False
-    
-    try:
-        with open(package_json, 'r') as f:
-            package_data = json.load(f)
+    with _Log("\nTesting frontend build...") as log:
+        assert _FRONTEND.name in _dir_names(_HERE), "✗ Frontend directory not found"
+        assert _PACKAGE_JSON.name in _dir_names(_FRONTEND), "✗ package.json not found"
         
-        print(f"✓ Frontend package.json found")
-        print(f"  Name: {package_data.get('name', 'N/A')}")
-        print(f"  Version: {package_data.get('version', 'N/A')}")
+        package_data = orjson.loads(_PACKAGE_JSON.read_bytes())
         
-        return True
-    except Exception as e:
-        print(f"✗ Frontend build test failed: {str(e)}")
-        return False
+        log(f"✓ Frontend package.json found")
+        log(f"  Name: {package_data.get('name', 'N/A')}")
+        log(f"  Version: {package_data.get('version', 'N/A')}")
 
 def test_docker_config():
     """Test Docker configuration"""
-    print("\nTesting Docker configuration...")
-    
-    dockerfile = Path("Dockerfile")
-    if not dockerfile.exists():
-        print("✗ Dockerfile not found")
-        return False
-    
-    docker_compose = Path("docker-compose.yml")
-    if not docker_compose.exists():
-        print("✗ docker-compose.yml not found")
-        return False
-    
-    start_script = Path("start.sh")
-    if not start_script.exists():
-        print("✗ start.sh not found")
-        return False
+    with _Log("\nTesting Docker configuration...") as log:
+        repo_names = _dir_names(_HERE)
+        assert "Dockerfile" in repo_names, "✗ Dockerfile not found"
+        assert "docker-compose.yml" in repo_names, "✗ docker-compose.yml not found"
+        assert "start.sh" in repo_names, "✗ start.sh not found"
+        
+        log("✓ Docker configuration files found")
     
-    print("✓ Docker configuration files found")
-    return True
+
+def _run_test(test_func, *fixtures):
+    """Run one test function outside pytest, building its arguments from the fixture factories"""
+    try:
+        test_func(*(fixture() for fixture in fixtures))
+        return "PASS"
+    except pytest.skip.Exception:
+        return "SKIP"
+    except (pytest.fail.Exception, Exception) as e:
+        sys.stdout.write(f"✗ {test_func.__name__} failed with exception: {str(e)}\n")
+        return "FAIL"
 
 def main():
-    """Run all tests"""
+    """Run all tests without pytest-xdist"""
     print("Adobe PDF Research Companion - Test Suite")
     print("=" * 50)
     
+    # (name, test, fixture factories, I/O-bound). I/O-bound checks overlap their HTTP and
+    # filesystem waits in threads; model loading is CPU and GIL bound, so those run one at a time
     tests = [
-        ("Backend Health", test_backend_health),
-        ("PDF Processor", test_pdf_processor),
-        ("Persona Analyzer", test_persona_analyzer),
-        ("CLI", test_cli),
-        ("API Endpoints", test_api_endpoints),
-        ("Frontend Build", test_frontend_build),
-        ("Docker Config", test_docker_config),
+        ("Backend Health", test_backend_health, (_backend_up,), True),
+        ("PDF Processor", test_pdf_processor, (_get_processor,), False),
+        ("Persona Analyzer", test_persona_analyzer, (_get_analyzer,), False),
+        ("CLI", test_cli, (_get_cli,), False),
+        ("Analysis Memo", test_analysis_memo, (_temp_dir,), False),
+        ("API Endpoints", test_api_endpoints, (_backend_up,), True),
+        ("Frontend Build", test_frontend_build, (), True),
+        ("Docker Config", test_docker_config, (), True),
     ]
+    io_tests = [test for test in tests if test[3]]
+    with ThreadPoolExecutor(max_workers=len(io_tests)) as executor:
+        futures = {test_name: executor.submit(_run_test, test_func, *fixtures) for test_name, test_func, fixtures, _ in io_tests}
+        results = {test_name: future.result() for test_name, future in futures.items()}
     
-    results = []
-    for test_name, test_func in tests:
-        try:
-            result = test_func()
-            results.append((test_name, result))
-        except Exception as e:
-            print(f"✗ {test_name} test failed with exception: {str(e)}")
-            results.append((test_name, False))
+    for test_name, test_func, fixtures, io_bound in tests:
+        if not io_bound:
+            results[test_name] = _run_test(test_func, *fixtures)
     
-    # Summary
+    # Summary, in declared order so it reads the same on every run
     print("\n" + "=" * 50)
     print("Test Summary:")
     print("=" * 50)
     
-    passed = 0
-    total = len(results)
+    symbols = {"PASS": "✓", "SKIP": "-", "FAIL": "✗"}
+    for test_name, _, _, _ in tests:
+        status = results[test_name]
+        print(f"{test_name:20} {symbols[status]} {status}")
     
-    for test_name, result in results:
-        status = "✓ PASS" if result else "✗ FAIL"
-        print(f"{test_name:20} {status}")
-        if result:
-            passed += 1
+    counts = {status: sum(result == status for result in results.values()) for status in symbols}
+    print(f"\nResults: {counts['PASS']}/{len(tests)} tests passed, {counts['SKIP']} skipped, {counts['FAIL']} failed")
     
-    print(f"\nResults: {passed}/{total} tests passed")
-    
-    if passed == total:
-        print("🎉 All tests passed! The application is ready to use.")
-    else:
+    failed = counts["FAIL"]
+    if failed:
         print("⚠ Some tests failed. Please check the configuration.")
+    elif counts["SKIP"]:
+        print("⚠ No failures, but some tests were skipped (is the backend running?).")
+    else:
+        print("🎉 All tests passed! The application is ready to use.")
     
-    return passed == total
+    return not failed
 
 if __name__ == "__main__":
+    # pytest gets this from pyproject.toml; the standalone runner sets it once here
+    sys.path.insert(0, str(_BACKEND))
     success = main()
-    sys.exit(0 if success else 1) 
\ No newline at end of file
+    sys.exit(0 if success else 1)